@@ -1,44 +1,15 @@
-import operator
 import unittest
-from random import choice
-from functools import reduce
-from typing import List, Set, Optional
+from array import array
+from collections import OrderedDict
+from random import Random
+from typing import Iterable, List, Optional, Tuple
 
 # literal: int.
 # if literal is negative, it is negated, otherwise positive
+# clause: array('i') of distinct literals (a disjunction of literals)
 
-
-class Clause:
-    """Represents a disjunction of literals (a clause)."""
-
-    def __init__(self, literals: Set[int]):
-        # Use frozenset internally for proper hashing/comparison stability
-        # and to enforce that literals within a clause are unique.
-        self.literals = set(literals)
-
-    def __len__(self):
-        return len(self.literals)
-
-    def __hash__(self):
-        # Must return an integer. Hash of a frozenset of literals ensures
-        # that clauses with the same literals are considered equal.
-        return hash(frozenset(self.literals))
-
-    def __eq__(self, other):
-        if not isinstance(other, Clause):
-            return False
-        return self.literals == other.literals
-
-    def __repr__(self):
-        return "({})".format(", ".join(map(str, sorted(self.literals))))
-
-    def dupe(self):
-        """Returns a deep copy of the clause."""
-        return Clause(set(self.literals))
-
-    def remove(self, literal: int):
-        """Removes a literal from the clause set."""
-        self.literals.discard(literal)
+# Maximum number of UNSAT residual formulas remembered by CNF.dpll()
+MEMO_SIZE = 100_000
 
 
 class CNF:
@@ -46,167 +17,530 @@ class CNF:
 
     def __init__(
         self,
-        clauses: List[Clause],
+        clauses: Iterable[Iterable[int]],
         num_literals: Optional[int] = None,
         num_clauses: Optional[int] = None,
+        memoize: bool = False,
     ):
-        # Use a set of Clause objects for efficient clause management
-        self.clauses = set(clauses)
+        # Clauses are stored positionally as packed int arrays. The first two
+        # literals of every clause with at least three literals are its watches.
+        self.clauses: List[array] = [array("i", set(c)) for c in clauses]
+        # Variables are numbered 1..num_vars; per-variable state lives in flat
+        # typed arrays indexed by variable (index 0 is unused).
+        self.num_vars = max((abs(l) for c in self.clauses for l in c), default=0)
+        # Per-literal lists are indexed by the literal itself: a list of
+        # 2 * num_vars + 1 entries (num_slots) holds literal v at index v and
+        # literal -v at Python's negative index -v, so lookups need no hashing
+        # or offset.
+        num_slots = 2 * self.num_vars + 1
+        # literal -> indices of the clauses currently watching that literal
+        self.watches: List[List[int]] = [[] for _ in range(num_slots)]
+        # literal -> literals implied by it through a binary clause: (a v b)
+        # is stored as ~a -> b and ~b -> a instead of being watched
+        self.implications: List[List[int]] = [[] for _ in range(num_slots)]
+        # literal -> indices of every clause containing that literal
+        self.occurrences: List[List[int]] = [[] for _ in range(num_slots)]
+        # variable -> 1 (True), -1 (False) or 0 (unassigned)
+        self.assignment = array("b", bytes(self.num_vars + 1))
+        # satisfied[i] is True while clause i contains a True literal
+        self.satisfied: List[bool] = [False] * len(self.clauses)
+        self.num_unsatisfied = len(self.clauses)
+        # variable -> number of unsatisfied clauses containing it positively
+        # (pos) or negatively (neg), kept up to date by assign() and undo_to()
+        self.pos = array("i", [0]) * (self.num_vars + 1)
+        self.neg = array("i", [0]) * (self.num_vars + 1)
+        # variables whose pos or neg count dropped to zero since apply_pure()
+        # last ran, i.e. the only ones that can have become pure
+        self.pure_candidates = set(range(1, self.num_vars + 1))
+        # lengths[i] is the number of literals of clause i that are not False
+        self.lengths = array("i", [len(c) for c in self.clauses])
+        # Jeroslow-Wang scores: the sum of 2^-|c| over the unsatisfied clauses
+        # c of the residual formula (lengths only count literals that are not
+        # False) containing the variable positively (pos_score) or negatively
+        # (neg_score), maintained alongside the occurrence counts
+        self.weights = array("d", [2.0 ** -len(c) for c in self.clauses])
+        self.pos_score = array("d", [0.0]) * (self.num_vars + 1)
+        self.neg_score = array("d", [0.0]) * (self.num_vars + 1)
+        # Zobrist hashing of the residual formula (the unsatisfied clauses,
+        # minus their False literals): every literal gets a random 64-bit
+        # value, clause_keys[i] is the XOR of the values of the literals of
+        # clause i that are not False, and formula_key sums the keys of the
+        # unsatisfied clauses (a sum, unlike an XOR, does not let clause keys
+        # cancel out literal by literal). Both are updated by assign() and
+        # undo_to(); formula_key indexes the UNSAT memo.
+        # Keeping the keys up to date costs time on every assignment and only
+        # pays off on formulas whose branches often meet the same residual
+        # formula (e.g. pigeonhole formulas), so it is opt-in: without
+        # memoize, every key stays 0 and nothing is memoized.
+        self.memoize = memoize
+        # literal -> its random value, indexed like the per-literal lists
+        if memoize:
+            rng = Random(0)
+            self.zobrist = array("Q", [rng.getrandbits(64) for _ in range(num_slots)])
+        else:
+            self.zobrist = array("Q", [0]) * num_slots
+        self.clause_keys = array("Q", [0]) * len(self.clauses)
+        self.formula_key = 0
+        # residual formula keys known to be UNSAT, least recently used first
+        self.memo: "OrderedDict[int, bool]" = OrderedDict()
+        # (split literal, trail length before it, formula_key before it or
+        # None if it must not be memoized, whether its second branch is being
+        # explored or handed off) for every open split
+        self.decisions: List[Tuple[int, int, Optional[int], bool]] = []
+        # assigned literals in assignment order; undo_to() replays it
+        # backwards to backtrack
+        self.trail = array("i")
+        # indices of the satisfied clauses, in the order they were satisfied;
+        # satisfied_marks[i] is its length before trail[i] was assigned
+        self.satisfied_trail = array("i")
+        self.satisfied_marks = array("i")
+        # number of trail literals whose watch lists have been visited: the
+        # rest of the trail is the propagation queue
+        self.propagated = 0
+        self.conflict = False
+
+        for index, clause in enumerate(self.clauses):
+            weight = self.weights[index]
+            for literal in clause:
+                self.occurrences[literal].append(index)
+                self.clause_keys[index] ^= self.zobrist[literal]
+                if literal > 0:
+                    self.pos[literal] += 1
+                    self.pos_score[literal] += weight
+                else:
+                    self.neg[-literal] += 1
+                    self.neg_score[-literal] += weight
+            self.formula_key += self.clause_keys[index]
+            if len(clause) == 0:
+                self.conflict = True
+            elif len(clause) == 2:
+                self.implications[-clause[0]].append(clause[1])
+                self.implications[-clause[1]].append(clause[0])
+            elif len(clause) >= 3:
+                self.watches[clause[0]].append(index)
+                self.watches[clause[1]].append(index)
+        for clause in self.clauses:
+            # Unit clauses are never watched, their literal is assigned up front
+            if len(clause) == 1 and not self.assign(clause[0]):
+                self.conflict = True
+
         self.num_literals = (
-            num_literals if num_literals is not None else len(self.get_literals())
+            num_literals
+            if num_literals is not None
+            else len({l for c in self.clauses for l in c})
         )
         self.num_clauses = num_clauses if num_clauses is not None else len(self.clauses)
 
+    @classmethod
+    def from_literals(
+        cls,
+        literals: array,
+        num_literals: Optional[int] = None,
+        num_clauses: Optional[int] = None,
+        memoize: bool = False,
+    ) -> "CNF":
+        """
+        Builds a CNF from a flat array('i') of clauses, each terminated by a 0
+        (the DIMACS clause encoding). Literals after the last 0 are ignored.
+        """
+        clauses = []
+        start = 0
+        while True:
+            try:
+                end = literals.index(0, start)
+            except ValueError:
+                break
+            clauses.append(literals[start:end])
+            start = end + 1
+        return cls(
+            clauses,
+            num_literals=num_literals,
+            num_clauses=num_clauses,
+            memoize=memoize,
+        )
+
+    def to_literals(self) -> array:
+        """Returns the clauses as a flat array('i') in the format read by from_literals()."""
+        literals = array("i")
+        for clause in self.clauses:
+            literals.extend(clause)
+            literals.append(0)
+        return literals
+
     def __repr__(self):
-        return "CNF: {" + " ^ ".join(str(c) for c in self.clauses) + "}"
+        return (
+            "CNF: {"
+            + " ^ ".join(
+                "({})".format(", ".join(map(str, sorted(c)))) for c in self.clauses
+            )
+            + "}"
+        )
+
+    def value(self, literal: int) -> int:
+        """Returns 1 if the literal is True, -1 if it is False and 0 if it is unassigned."""
+        if literal > 0:
+            return self.assignment[literal]
+        return -self.assignment[-literal]
 
     def get_literals(self):
-        return reduce(operator.or_, [c.literals for c in self.clauses], set())
+        """Returns the unassigned literals of the clauses not yet satisfied."""
+        literals = set()
+        for var in range(1, self.num_vars + 1):
+            if self.assignment[var]:
+                continue
+            if self.pos[var]:
+                literals.add(var)
+            if self.neg[var]:
+                literals.add(-var)
+        return literals
 
-    def add_literal(self, literal: int) -> "CNF":
+    def assign(self, literal: int) -> bool:
+        """
+        Sets the literal to True, marks the clauses containing it as satisfied
+        (discounting their literals from the occurrence counts) and appends it
+        to the trail, where apply_unit() will pick it up for propagation.
+        Returns False if the literal was already assigned False.
+        """
+        value = self.value(literal)
+        if value:
+            return value > 0
+        if literal > 0:
+            self.assignment[literal] = 1
+        else:
+            self.assignment[-literal] = -1
+        satisfied_trail = self.satisfied_trail
+        start = len(satisfied_trail)
+        for index in self.occurrences[literal]:
+            if not self.satisfied[index]:
+                self.satisfied[index] = True
+                satisfied_trail.append(index)
+                weight = self.weights[index]
+                for l in self.clauses[index]:
+                    if l > 0:
+                        self.pos[l] -= 1
+                        self.pos_score[l] -= weight
+                        if not self.pos[l]:
+                            self.pure_candidates.add(l)
+                    else:
+                        self.neg[-l] -= 1
+                        self.neg_score[-l] -= weight
+                        if not self.neg[-l]:
+                            self.pure_candidates.add(-l)
+                self.formula_key -= self.clause_keys[index]
+        self.num_unsatisfied -= len(satisfied_trail) - start
+        self._falsify(-literal)
+        self.trail.append(literal)
+        self.satisfied_marks.append(start)
+        return True
+
+    def _falsify(self, literal: int):
+        """
+        Removes a literal that was just assigned False from the residual
+        clauses containing it: shortens them, doubles their weights (updating
+        the scores of the unsatisfied ones) and toggles it in their keys.
+        """
+        clauses, lengths, weights = self.clauses, self.lengths, self.weights
+        satisfied = self.satisfied
+        pos_score, neg_score = self.pos_score, self.neg_score
+        for index in self.occurrences[literal]:
+            lengths[index] -= 1
+            delta = weights[index]
+            weights[index] = 2 * delta
+            if not satisfied[index]:
+                for l in clauses[index]:
+                    if l > 0:
+                        pos_score[l] += delta
+                    else:
+                        neg_score[-l] += delta
+        if self.memoize:
+            self._toggle_key(literal)
+
+    def _unfalsify(self, literal: int):
+        """Undoes _falsify() for a literal that is being unassigned."""
+        clauses, lengths, weights = self.clauses, self.lengths, self.weights
+        satisfied = self.satisfied
+        pos_score, neg_score = self.pos_score, self.neg_score
+        for index in self.occurrences[literal]:
+            lengths[index] += 1
+            delta = weights[index] / 2
+            weights[index] = delta
+            if not satisfied[index]:
+                for l in clauses[index]:
+                    if l > 0:
+                        pos_score[l] -= delta
+                    else:
+                        neg_score[-l] -= delta
+        if self.memoize:
+            self._toggle_key(literal)
+
+    def _toggle_key(self, literal: int):
         """
-        Returns a *new* CNF object representing the current formula
-        AND the new unit clause containing the literal.
-        This is used for the splitting step.
+        Toggles a False literal in the keys of the clauses containing it (and
+        in formula_key for the unsatisfied ones). Applying it twice undoes it.
         """
-        new_clauses = [c.dupe() for c in self.clauses]
-        new_clauses.append(Clause({literal}))
-        return CNF(new_clauses)
+        value = self.zobrist[literal]
+        clause_keys, satisfied = self.clause_keys, self.satisfied
+        formula_key = self.formula_key
+        for index in self.occurrences[literal]:
+            old_key = clause_keys[index]
+            new_key = clause_keys[index] = old_key ^ value
+            if not satisfied[index]:
+                formula_key += new_key - old_key
+        self.formula_key = formula_key
+
+    def undo_to(self, mark: int):
+        """
+        Backtracks to the point where the trail had length `mark`: unassigns
+        every literal assigned since and restores the clauses they satisfied.
+        Clause literals are never modified, so nothing else has to be undone.
+        """
+        satisfied_trail = self.satisfied_trail
+        while len(self.trail) > mark:
+            literal = self.trail.pop()
+            start = self.satisfied_marks.pop()
+            self.assignment[abs(literal)] = 0
+            # Restore the clauses' lengths before the ones this literal
+            # satisfied, so they are unsatisfied with the weight they had
+            self._unfalsify(-literal)
+            self.num_unsatisfied += len(satisfied_trail) - start
+            while len(satisfied_trail) > start:
+                index = satisfied_trail.pop()
+                self.satisfied[index] = False
+                self.formula_key += self.clause_keys[index]
+                weight = self.weights[index]
+                for l in self.clauses[index]:
+                    if l > 0:
+                        self.pos[l] += 1
+                        self.pos_score[l] += weight
+                    else:
+                        self.neg[-l] += 1
+                        self.neg_score[-l] += weight
+        self.propagated = min(self.propagated, mark)
+        self.conflict = False
 
     def is_sat(self) -> bool:
         """
-        Checks if the CNF is satisfied. In DPLL, this means the clause set is empty.
-        (Note: The original implementation logic was confusing here, using the standard
-        DPLL definition: an empty set of clauses is satisfied.)
+        Checks if the CNF is satisfied. In DPLL, this means the clause set is empty,
+        i.e. every clause is satisfied by the current assignment.
         """
-        return len(self.clauses) == 0
+        return not self.conflict and self.num_unsatisfied == 0
 
     def is_unsat(self) -> bool:
         """
         Checks if the CNF is unsatisfiable, which occurs when it contains
-        an empty clause (a clause with length 0, denoted as \\square).
+        an empty clause (a clause with length 0, denoted as \\square), i.e.
+        a clause whose literals have all been assigned False.
         """
-        return any(len(c) == 0 for c in self.clauses)
+        return self.conflict
 
     def apply_pure(self, verbose=True) -> bool:
         """
         Applies Pure Literal Elimination.
-        Removes all clauses containing a pure literal (one that appears only
-        positively or only negatively across the formula).
+        Assigns every pure literal (one that appears only positively or only
+        negatively across the unsatisfied clauses) to True, which satisfies
+        (removes) all clauses containing it.
         Returns True if any clause was removed.
+        Only the variables in pure_candidates are checked. DPLL backtracks to
+        states where pure literals were already eliminated, so undo_to() never
+        makes a new variable pure.
         """
-        # Find all literals present in the formula
-        all_literals = self.get_literals()
-
-        # Determine the set of pure literals
-        pure_set = {l for l in all_literals if -l not in all_literals}
+        # Determine the set of pure literals from the occurrence counts,
+        # without scanning the clauses
+        pure_set = set()
+        for var in self.pure_candidates:
+            if self.assignment[var]:
+                continue
+            if self.pos[var] and not self.neg[var]:
+                pure_set.add(var)
+            elif self.neg[var] and not self.pos[var]:
+                pure_set.add(-var)
 
+        self.pure_candidates.clear()
         if not pure_set:
             return False
 
-        clauses_to_keep = set()
-        removed_count = 0
+        removed_count = self.num_unsatisfied
+        for literal in pure_set:
+            self.assign(literal)
+        removed_count -= self.num_unsatisfied
 
-        # Keep only clauses that DO NOT contain a pure literal
-        for clause in self.clauses:
-            if not clause.literals.intersection(pure_set):
-                clauses_to_keep.add(clause)
-            else:
-                removed_count += 1
-
-        self.clauses = clauses_to_keep
         if verbose:
             print(f"  > Pure Literal Elimination: Removed {removed_count} clauses.")
         return removed_count > 0
 
     def apply_unit(self, verbose=True) -> bool:
         """
-        Applies Unit Propagation.
-        Finds the first unit clause (length 1) and assigns its literal to True.
-        1. Removes clauses containing the unit literal (satisfied).
-        2. Removes the negation of the unit literal from other clauses (simplification).
-        Returns True if any unit propagation occurred (i.e., if a unit clause was found).
+        Applies Unit Propagation using two watched literals per clause.
+        For every assignment on the trail not propagated yet, the literals it
+        implies through binary clauses are assigned first, then only the longer
+        clauses watching the falsified literal are visited: each either moves
+        its watch to another non-False literal, becomes a unit (its other watch
+        is assigned True), or is found to be empty (both watches False), which
+        sets the conflict flag.
+        Returns True if any unit propagation occurred (i.e., if an assignment was pending).
+        Watch lists are compacted in place, so propagation allocates nothing.
         """
-        unit_clauses = [c for c in self.clauses if len(c) == 1]
-
-        if not unit_clauses:
-            return False
-
-        # Select the first unit literal found
-        (unit_literal,) = unit_clauses[0].literals
-        removed_clauses = set()
-        simplified_clauses = 0
-
-        # Create a new set of clauses after applying the assignment
-        new_clauses = set()
+        assignment, trail, satisfied = self.assignment, self.trail, self.satisfied
+        implications = self.implications
+        propagated = False
+        while self.propagated < len(trail) and not self.conflict:
+            unit_literal = trail[self.propagated]
+            self.propagated += 1
+            propagated = True
+            # Binary clauses need no watch bookkeeping: each implied literal is
+            # either already True, or assigned, or False (a conflict)
+            for implied in implications[unit_literal]:
+                if not self.assign(implied):
+                    self.conflict = True
+                    break
+            if self.conflict:
+                break
+            false_literal = -unit_literal
+            watchers = self.watches[false_literal]
+            # watchers[:j] are the clauses that keep watching false_literal
+            i = j = 0
+            end = len(watchers)
+            while i < end:
+                index = watchers[i]
+                i += 1
+                if satisfied[index]:
+                    # Clause is already satisfied by one of its non-watched
+                    # literals (assigned earlier, e.g. on this same level):
+                    # leave its watches alone
+                    watchers[j] = index
+                    j += 1
+                    continue
+                clause = self.clauses[index]
+                # Keep the falsified watch in position 1
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                other = clause[0]
+                if (assignment[other] if other > 0 else -assignment[-other]) > 0:
+                    # Clause is satisfied, leave the watch where it is
+                    watchers[j] = index
+                    j += 1
+                    continue
+                for k in range(2, len(clause)):
+                    l = clause[k]
+                    if (assignment[l] if l > 0 else -assignment[-l]) >= 0:
+                        # Move the watch to a literal that is not False
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1]].append(index)
+                        break
+                else:
+                    # No replacement: the clause is unit on `other` (or empty)
+                    watchers[j] = index
+                    j += 1
+                    if not self.assign(other):
+                        # Stop here, the unvisited clauses keep their watch
+                        self.conflict = True
+                        break
+            del watchers[j:i]
+            if verbose:
+                print(
+                    f"  > Unit Propagation (Literal={unit_literal}): Formula simplified."
+                )
+        return propagated
 
-        for other_clause in self.clauses:
-            # Skip the clause that was used for propagation (it will be satisfied)
-            if other_clause == unit_clauses[0]:
+    def jw_select(self) -> int:
+        """
+        Selects a literal by the two-sided Jeroslow-Wang heuristic: the unassigned
+        variable occurring in the unsatisfied clauses with the highest combined
+        score J(v) + J(-v), in the polarity with the higher score.
+        Returns 0 if no unassigned variable occurs in an unsatisfied clause.
+        """
+        best_literal, best_score = 0, -1.0
+        for var in range(1, self.num_vars + 1):
+            if self.assignment[var] or not (self.pos[var] or self.neg[var]):
                 continue
-
-            # Case 1: Clause is satisfied (contains the unit literal)
-            if unit_literal in other_clause.literals:
-                removed_clauses.add(
-                    other_clause
-                )  # Mark for removal (or simply don't add to new_clauses)
-
-            # Case 2: Clause is simplified (contains the negation)
-            elif -unit_literal in other_clause.literals:
-                simplified_clauses += 1
-                # Must create a deep copy to modify it safely while iterating/building new set
-                simplified_clause = other_clause.dupe()
-                simplified_clause.remove(-unit_literal)
-                new_clauses.add(simplified_clause)
-
-            # Case 3: Clause is unaffected
-            else:
-                new_clauses.add(other_clause)
-
-        self.clauses = new_clauses
-        if verbose:
-            print(f"  > Unit Propagation (Literal={unit_literal}): Formula simplified.")
-        return True  # Since we found a unit clause, propagation occurred
+            pos_score, neg_score = self.pos_score[var], self.neg_score[var]
+            if pos_score + neg_score > best_score:
+                best_score = pos_score + neg_score
+                best_literal = var if pos_score >= neg_score else -var
+        return best_literal
 
     def apply_split(self, verbose=True) -> bool:
         """
-        Selects an arbitrary literal and tries DPLL with the literal set to True,
-        and if that fails, tries it set to False (by adding the negative unit clause).
+        Selects the literal with the highest Jeroslow-Wang score, records the
+        split on the decision stack and sets the literal to True. If that branch
+        fails, backtrack() tries the literal set to False.
+        Returns False if there was nothing to split on.
         """
-        # Find all literals present in the formula
-        literals = self.get_literals()
+        split_literal = self.jw_select()
 
-        if not literals:
+        if not split_literal:
             # Should not happen if not is_sat() or is_unsat() returned True
             return False
 
-        # Select some literal randomly to split on
-        split_literal = choice(tuple(literals))
         if verbose:
             print(f"  > Splitting on literal: {split_literal}")
 
         # DPLL(F U {l}) OR DPLL(F U {~l})
-        return (
-            self.add_literal(split_literal).dpll()
-            or self.add_literal(-split_literal).dpll()
-        )
+        key = self.formula_key if self.memoize else None
+        decision = (split_literal, len(self.trail), key, False)
+        self.decisions.append(decision)
+        self.assign(split_literal)
+        return True
 
-    def dpll(self, verbose: bool = False) -> bool:
-        """The main DPLL algorithm loop."""
-        if verbose:
-            print(f"\n--- Starting DPLL Cycle ({len(self.clauses)} clauses) ---")
+    def backtrack(self, verbose=True) -> bool:
+        """
+        Undoes the most recent split whose second branch has not been tried yet
+        and sets its literal to False. Splits whose branches both failed are
+        popped on the way and their residual formulas are memoized as UNSAT.
+        Returns False if no untried branch remains, i.e. the formula is UNSAT.
+        """
+        while self.decisions:
+            split_literal, mark, key, flipped = self.decisions.pop()
+            self.undo_to(mark)
+            if not flipped:
+                if verbose:
+                    print(f"  > Backtracking: trying literal {-split_literal}")
+                self.decisions.append((split_literal, mark, key, True))
+                self.assign(-split_literal)
+                return True
+            if key is not None:
+                self.memo[key] = False
+                if len(self.memo) > MEMO_SIZE:
+                    self.memo.popitem(last=False)
+        return False
+
+    def hand_off_split(self) -> List[int]:
+        """
+        Gives up the second branch of the most recent split so it can be solved
+        elsewhere: backtrack() will skip it. None of the open splits are memoized
+        any more, since the subtree of each of them now contains a branch that
+        is not refuted here.
+        Returns the decisions leading to that branch (the current split literals
+        of the open splits, with the most recent one negated).
+        """
+        self.decisions = [
+            (literal, mark, None, flipped)
+            for literal, mark, _, flipped in self.decisions
+        ]
+        split_literal, mark, _, _ = self.decisions[-1]
+        self.decisions[-1] = (split_literal, mark, None, True)
+        cube = [self.trail[mark] for _, mark, _, _ in self.decisions[:-1]]
+        cube.append(-split_literal)
+        return cube
 
+    def simplify(self, verbose: bool = False) -> Optional[bool]:
+        """
+        Applies Unit Propagation and Pure Literal Elimination to the current
+        assignment. Returns True if the formula is satisfied, False if it is
+        unsatisfiable under the assignment, and None if a split is needed.
+        """
         # 1. Apply Unit Propagation until no more unit clauses exist
-        while self.apply_unit(verbose=verbose):
-            # Check for immediate contradiction after propagation
-            if self.is_unsat():
-                if verbose:
-                    print("--- UNSAT: Found empty clause after Unit Propagation ---")
-                return False
+        self.apply_unit(verbose=verbose)
+        # Check for immediate contradiction after propagation
+        if self.is_unsat():
+            if verbose:
+                print("--- UNSAT: Found empty clause after Unit Propagation ---")
+            return False
 
-        # 2. Apply Pure Literal Elimination until no more pure literals exist
+        # 2. Apply Pure Literal Elimination until no more pure literals exist.
+        # The assignments are propagated so the watches stay consistent.
         while self.apply_pure(verbose=verbose):
-            pass
+            self.apply_unit(verbose=verbose)
 
         # 3. Check for base cases
         if self.is_sat():
@@ -219,8 +553,37 @@ class CNF:
                 print("--- UNSAT: Found empty clause (after pure elimination) ---")
             return False
 
-        # 4. Splitting (Branching)
-        return self.apply_split(verbose=verbose)
+        # 4. Skip residual formulas already shown UNSAT on another branch.
+        # A (vanishingly unlikely) 64-bit hash collision would make this
+        # report UNSAT wrongly; SAT results are never cached.
+        if self.memoize and self.formula_key in self.memo:
+            self.memo.move_to_end(self.formula_key)
+            if verbose:
+                print("--- UNSAT: Residual formula already refuted ---")
+            return False
+        return None
+
+    def dpll(self, verbose: bool = False) -> bool:
+        """
+        The main DPLL algorithm loop. Runs iteratively: splits are pushed onto
+        the decision stack and failed branches are backtracked through the
+        trail, so no recursion or formula copies are involved.
+        """
+        while True:
+            if verbose:
+                print(
+                    f"\n--- Starting DPLL Cycle ({len(self.trail)} literals assigned) ---"
+                )
+
+            result = self.simplify(verbose=verbose)
+            if result is None:
+                # Splitting (Branching)
+                if not self.apply_split(verbose=verbose):
+                    return False
+            elif result:
+                return True
+            elif not self.backtrack(verbose=verbose):
+                return False
 
 
 class DPLLTests(unittest.TestCase):
@@ -232,14 +595,14 @@ class DPLLTests(unittest.TestCase):
 
     def test_02_trivial_unsat(self):
         """Test the formula containing only the empty clause: it is UNSAT."""
-        cnf = CNF([Clause(set())])
+        cnf = CNF([set()])
         self.assertFalse(cnf.dpll(), "CNF with empty clause should be UNSAT.")
 
     def test_03_unit_propagation_sat(self):
         """Test formula solvable by Unit Propagation (e.g., (1) ^ (~1 v 2))."""
         clauses = [
-            Clause({1}),  # Unit clause: 1 is True
-            Clause({-1, 2}),  # Should simplify to (2)
+            {1},  # Unit clause: 1 is True
+            {-1, 2},  # Should simplify to (2)
         ]
         cnf = CNF(clauses)
         self.assertTrue(cnf.dpll(), "Unit propagation should lead to SAT.")
@@ -247,8 +610,8 @@ class DPLLTests(unittest.TestCase):
     def test_04_unit_propagation_unsat(self):
         """Test formula solvable by Unit Propagation leading to contradiction (e.g., (1) ^ (~1))."""
         clauses = [
-            Clause({1}),  # 1 is True
-            Clause({-1}),  # -1 is True, leading to 1 AND -1 (contradiction)
+            {1},  # 1 is True
+            {-1},  # -1 is True, leading to 1 AND -1 (contradiction)
         ]
         cnf = CNF(clauses)
         self.assertFalse(
@@ -259,7 +622,7 @@ class DPLLTests(unittest.TestCase):
         """Test formula solvable by Pure Literal Elimination (e.g., (1 v 2) ^ (-2 v 3) ^ (1 v 3))."""
         # Literal 2 is NOT pure (appears as 2 and -2).
         # Literal 3 is PURE (only appears as 3).
-        clauses = [Clause({1, 2}), Clause({-2, 3}), Clause({1, 3})]
+        clauses = [{1, 2}, {-2, 3}, {1, 3}]
         cnf = CNF(clauses)
         # Setting 3=True should satisfy and remove the last two clauses.
         # The remaining clause (1 v 2) will satisfy the formula.
@@ -268,7 +631,7 @@ class DPLLTests(unittest.TestCase):
     def test_06_simple_splitting_sat(self):
         """Test a formula requiring one split to be solved (e.g., (1 v 2))."""
         # No unit or pure literals. Must split.
-        clauses = [Clause({1, 2}), Clause({-1, -2})]
+        clauses = [{1, 2}, {-1, -2}]
         cnf = CNF(clauses)
         # Split on 1.
         # Branch 1 (+1): Formula becomes (1) ^ (-1 v -2) -> Unit prop -> (-2). Final state: (-2) -> SAT.
@@ -279,7 +642,7 @@ class DPLLTests(unittest.TestCase):
         """Test a formula that is inherently UNSAT and requires splitting (XOR of 3 vars, e.g., (1 XOR 2 XOR 3) and (1 XOR 2 XOR 3)). This is a known UNSAT case."""
         # A simple contradiction with 2 variables: (A v B) ^ (A v ~B) ^ (~A v B) ^ (~A v ~B)
         # This covers all 4 possible assignments for A and B.
-        clauses = [Clause({1, 2}), Clause({1, -2}), Clause({-1, 2}), Clause({-1, -2})]
+        clauses = [{1, 2}, {1, -2}, {-1, 2}, {-1, -2}]
         cnf = CNF(clauses)
         # Requires splitting, which will eventually lead to an empty clause on all branches.
         # Split on 1:
@@ -300,17 +663,17 @@ class DPLLTests(unittest.TestCase):
         """
         clauses = [
             # Every pigeon must be in a hole (Exhaustion)
-            Clause({1, 2}),
-            Clause({3, 4}),
-            Clause({5, 6}),
+            {1, 2},
+            {3, 4},
+            {5, 6},
             # Hole A can't hold two pigeons (Exclusivity)
-            Clause({-1, -3}),  # Not (P1A and P2A)
-            Clause({-1, -5}),  # Not (P1A and P3A)
-            Clause({-3, -5}),  # Not (P2A and P3A)
+            {-1, -3},  # Not (P1A and P2A)
+            {-1, -5},  # Not (P1A and P3A)
+            {-3, -5},  # Not (P2A and P3A)
             # Hole B can't hold two pigeons (Exclusivity)
-            Clause({-2, -4}),  # Not (P1B and P2B)
-            Clause({-2, -6}),  # Not (P1B and P3B)
-            Clause({-4, -6}),  # Not (P2B and P3B)
+            {-2, -4},  # Not (P1B and P2B)
+            {-2, -6},  # Not (P1B and P3B)
+            {-4, -6},  # Not (P2B and P3B)
         ]
         cnf = CNF(clauses)
         self.assertFalse(cnf.dpll(), "Pigeonhole Principle (3 into 2) should be UNSAT.")
@@ -321,25 +684,132 @@ class DPLLTests(unittest.TestCase):
         V=7, C=15. Ratio C/V ~ 2.1. This should require a few branches.
         """
         clauses = [
-            Clause({-1, -2, -3}),
-            Clause({-2, 3, 7}),
-            Clause({-1, 4, 5}),
-            Clause({1, 2, -6}),
-            Clause({3, 4, -7}),
-            Clause({-4, 5, 6}),
-            Clause({1, -5, -6}),
-            Clause({-3, -4, 7}),
-            Clause({-1, 2, 5}),
-            Clause({1, -3, 6}),
-            Clause({-5, 6, 7}),
-            Clause({-2, -5, -7}),
-            Clause({-1, 3, -4}),
-            Clause({2, 4, -5}),
-            Clause({1, -7}),  # This unit/near-unit helps guide the solver
+            {-1, -2, -3},
+            {-2, 3, 7},
+            {-1, 4, 5},
+            {1, 2, -6},
+            {3, 4, -7},
+            {-4, 5, 6},
+            {1, -5, -6},
+            {-3, -4, 7},
+            {-1, 2, 5},
+            {1, -3, 6},
+            {-5, 6, 7},
+            {-2, -5, -7},
+            {-1, 3, -4},
+            {2, 4, -5},
+            {1, -7},  # This unit/near-unit helps guide the solver
         ]
         cnf = CNF(clauses)
         self.assertTrue(cnf.dpll(), "Moderate random 3-CNF should be SAT.")
 
+    def test_10_jeroslow_wang_selection(self):
+        """Test that splitting picks the literal favoured by the Jeroslow-Wang scores."""
+        # J(1) = 1/4 + 1/4, J(-1) = 1/8, J(2) = J(3) = 1/4 + 1/8, J(-2) = J(-3) = 0
+        clauses = [{1, 2}, {1, 3}, {-1, 2, 3}]
+        cnf = CNF(clauses)
+        self.assertEqual(cnf.jw_select(), 1, "Variable 1 has the highest score.")
+        # Once 1 is True only (-1 v 2 v 3) is left, shrunk to (2 v 3): 2 and 3
+        # both score 1/4
+        cnf.assign(1)
+        self.assertIn(cnf.jw_select(), (2, 3))
+        self.assertEqual(cnf.lengths[2], 2)
+        self.assertEqual(cnf.pos_score[2], 0.25, "Shrunk clause should weigh more.")
+        self.assertEqual(cnf.pos_score[3], 0.25, "Shrunk clause should weigh more.")
+        cnf.undo_to(0)
+        self.assertEqual(cnf.pos_score[2], 0.375, "Undo should restore the scores.")
+
+    def test_11_php_4_to_3_unsat_memoized(self):
+        """
+        Test the Pigeonhole Principle (PHP_4^3): it is UNSAT, and the residual formulas
+        refuted while splitting are remembered so other branches can skip them.
+        Variables: 3 * pigeon + hole + 1 for pigeons 0..3 and holes 0..2
+        """
+        var = lambda pigeon, hole: 3 * pigeon + hole + 1
+        clauses = [{var(p, h) for h in range(3)} for p in range(4)]
+        for h in range(3):
+            for p in range(4):
+                for q in range(p + 1, 4):
+                    clauses.append({-var(p, h), -var(q, h)})
+        cnf = CNF(clauses, memoize=True)
+        self.assertFalse(cnf.dpll(), "Pigeonhole Principle (4 into 3) should be UNSAT.")
+        self.assertTrue(cnf.memo, "Refuted residual formulas should be memoized.")
+
+    def test_12_parallel_dpll(self):
+        """Test that the parallel solver agrees with DPLL on a SAT and an UNSAT formula."""
+        import multiprocessing
+        import queue
+
+        from parallel_dpll import _search, parallel_dpll
+
+        # (A v B) ^ (A v ~B) ^ (~A v B) ^ (~A v ~B) is UNSAT, (1 v 2) ^ (~1 v ~2) is SAT
+        unsat_clauses = [{1, 2}, {1, -2}, {-1, 2}, {-1, -2}]
+        sat_clauses = [{1, 2}, {-1, -2}]
+        self.assertFalse(parallel_dpll(CNF(unsat_clauses), processes=2))
+        self.assertTrue(parallel_dpll(CNF(sat_clauses), processes=2))
+
+        # With a worker always reported idle, every split of PHP_4^3 hands off
+        # its second branch; the handed-off cubes must all be refuted too
+        var = lambda pigeon, hole: 3 * pigeon + hole + 1
+        clauses = [{var(p, h) for h in range(3)} for p in range(4)]
+        for h in range(3):
+            for p in range(4):
+                for q in range(p + 1, 4):
+                    clauses.append({-var(p, h), -var(q, h)})
+        cnf = CNF(clauses)
+        tasks = queue.Queue()
+        pending = multiprocessing.Value("i", 1)
+        idle = multiprocessing.Value("i", 1)
+        self.assertFalse(_search(cnf, (), tasks, pending, idle))
+        self.assertFalse(tasks.empty(), "Branches should have been handed off.")
+        solved = 1
+        while not tasks.empty():
+            cnf.undo_to(0)
+            self.assertFalse(_search(cnf, tasks.get(), tasks, pending, idle))
+            solved += 1
+        self.assertEqual(pending.value, solved, "Every hand-off should be counted.")
+
+    def test_13_binary_implications(self):
+        """Test that binary clauses propagate through the implication lists, not the watches."""
+        # (1) ^ (~1 v 2) ^ (~2 v 3) ^ (~3 v ~1): 1 -> 2 -> 3 -> ~1, a contradiction
+        clauses = [{1}, {-1, 2}, {-2, 3}, {-3, -1}]
+        cnf = CNF(clauses)
+        self.assertFalse(any(cnf.watches), "Binary clauses should not be watched.")
+        self.assertFalse(cnf.dpll(), "Binary implication chain should be UNSAT.")
+
+    def test_14_hand_off_keeps_memo_sound(self):
+        """Test that handing off branches never memoizes a SAT residual formula."""
+        rng = Random(1)
+        memoized = 0
+        for _ in range(20):
+            # Random 3-CNF with 25 variables near the satisfiability threshold
+            clauses = [
+                {rng.choice((1, -1)) * v for v in rng.sample(range(1, 26), 3)}
+                for _ in range(106)
+            ]
+            cnf = CNF(clauses, memoize=True)
+            # Residual formula (unsatisfied clauses minus False literals) per key
+            residuals = {}
+            splits = 0
+            while True:
+                result = cnf.simplify()
+                if result is None:
+                    residuals[cnf.formula_key] = [
+                        {l for l in c if cnf.value(l) >= 0}
+                        for i, c in enumerate(cnf.clauses)
+                        if not cnf.satisfied[i]
+                    ]
+                    cnf.apply_split(verbose=False)
+                    splits += 1
+                    if splits % 3 == 0:
+                        cnf.hand_off_split()
+                elif result or not cnf.backtrack(verbose=False):
+                    break
+            for key in cnf.memo:
+                self.assertFalse(CNF(residuals[key]).dpll(), "Memoized SAT formula.")
+            memoized += len(cnf.memo)
+        self.assertTrue(memoized, "Some residual formulas should be memoized.")
+
 
 if __name__ == "__main__":
     # You can run the tests by uncommenting the line below:
@@ -347,11 +817,11 @@ if __name__ == "__main__":
 
     # Example usage for manual testing:
     print("\n--- Manual Test: (1) ^ (~1 v 2) ---")
-    manual_clauses = [Clause({1}), Clause({-1, 2})]
+    manual_clauses = [{1}, {-1, 2}]
     manual_cnf = CNF(manual_clauses)
     print(f"Result: {manual_cnf.dpll()}")  # Expected: True
 
     print("\n--- Manual Test: (1) ^ (-1) ---")
-    manual_clauses_unsat = [Clause({1}), Clause({-1})]
+    manual_clauses_unsat = [{1}, {-1}]
     manual_cnf_unsat = CNF(manual_clauses_unsat)
     print(f"Result: {manual_cnf_unsat.dpll()}")  # Expected: False
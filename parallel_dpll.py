@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import queue
+from array import array
+from typing import Optional, Tuple
+
+from dpll_sat import CNF
+
+
+def _search(problem: CNF, cube: Tuple[int, ...], tasks, pending, idle) -> bool:
+    """
+    Runs DPLL on the problem with the literals of the cube set to True.
+    While other workers are idle, the second branch of each split is handed off
+    to them through the task queue instead of being explored here.
+    """
+    for literal in cube:
+        if not problem.assign(literal):
+            return False
+    while True:
+        result = problem.simplify()
+        if result is None:
+            if not problem.apply_split(verbose=False):
+                return False
+            if idle.value > 0:
+                with pending.get_lock():
+                    pending.value += 1
+                tasks.put(cube + tuple(problem.hand_off_split()))
+        elif result:
+            return True
+        elif not problem.backtrack(verbose=False):
+            return False
+
+
+def _worker(literals: array, tasks, results, pending, idle):
+    problem = CNF.from_literals(literals)
+    # Propagate the top level once; every cube is solved from this state
+    root_result = problem.simplify()
+    root = len(problem.trail)
+    while True:
+        with idle.get_lock():
+            idle.value += 1
+        cube = tasks.get()
+        with idle.get_lock():
+            idle.value -= 1
+        if root_result is None:
+            sat = _search(problem, cube, tasks, pending, idle)
+            problem.undo_to(root)
+        else:
+            sat = root_result
+        if sat:
+            results.put(True)
+            return
+        with pending.get_lock():
+            pending.value -= 1
+            done = pending.value == 0
+        if done:
+            results.put(False)
+
+
+def parallel_dpll(problem: CNF, processes: Optional[int] = None) -> bool:
+    """
+    Runs DPLL on several worker processes (one per CPU by default) which share
+    the branches of the search tree: a worker splitting while another one is
+    idle queues its second branch as a cube (a list of decision literals) that
+    the idle worker replays and solves. The formula is SAT as soon as any cube
+    is, and UNSAT once every queued cube has been refuted.
+    """
+    ctx = multiprocessing.get_context("spawn")  # safest for Windows
+    tasks, results = ctx.Queue(), ctx.Queue()
+    # cubes queued or being solved, and workers waiting for a cube
+    pending = ctx.Value("i", 1)
+    idle = ctx.Value("i", 0)
+    tasks.put(())
+    literals = problem.to_literals()
+    workers = [
+        ctx.Process(
+            target=_worker, args=(literals, tasks, results, pending, idle), daemon=True
+        )
+        for _ in range(processes or os.cpu_count() or 1)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while True:
+            try:
+                return results.get(timeout=0.1)
+            except queue.Empty:
+                # A worker only exits by itself (with exit code 0) after
+                # queueing a SAT result
+                if any(worker.exitcode not in (None, 0) for worker in workers):
+                    raise RuntimeError("Worker process exited without a result")
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from parse_dimacs import parse_dimacs
+
+    filename = sys.argv[1]
+    problem = parse_dimacs(filename)
+    start_time = time.time()
+    result = parallel_dpll(problem)
+    print(
+        "{} in {:.2f}s".format("SAT" if result else "UNSAT", time.time() - start_time)
+    )
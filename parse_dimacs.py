@@ -1,97 +1,183 @@
 import os
+import io
+import re
+import tempfile
 import time
-from enum import Enum
+import unittest
+from array import array
+from contextlib import redirect_stdout
+from multiprocessing.shared_memory import SharedMemory
+from typing import Tuple
 
-from dpll_sat import Clause, CNF
+from dpll_sat import CNF
 
 
-class ParserState(Enum):
-    INIT = 0
-    PROB = 1
-
+def read_dimacs(filename) -> Tuple[array, int, int]:
+    """
+    Reads a DIMACS CNF file into its stream of 0-terminated clause literals
+    (as accepted by CNF.from_literals) and the header's literal and clause counts.
+    """
+    with open(filename, "r") as f:
+        data = f.read()
+    # blank out comment lines, keeping their newlines so line numbers still match
+    data = re.sub(r"^c.*$", "", data, flags=re.MULTILINE)
 
-def parse_dimacs(filename) -> CNF:
-    parser_state = ParserState.INIT
+    header = re.search(r"^p.*$", data, flags=re.MULTILINE)
+    preamble = data[: header.start()] if header else data
+    if preamble.strip():
+        offset = len(preamble) - len(preamble.lstrip())
+        raise ValueError(
+            'Error on line {}: Unexpected character "{}" found while parsing in INIT state'.format(
+                data.count("\n", 0, offset), preamble[offset]
+            )
+        )
+    if header is None:
+        return array("i"), -1, -1
+    line_num = data.count("\n", 0, header.start())
+    prob_info = header.group().split()
+    assert len(prob_info) == 4
+    assert prob_info[0] == "p"
+    assert prob_info[1] == "cnf", "Non-CNF formats unsupported"
     num_literals, num_clauses = -1, -1
-    clauses = []
-    current_literals = set()
-    with open(filename, "r") as f:
-        for line_num, line in enumerate(f.readlines()):
-            # remove trailing whitespace
-            line = line.rstrip()
-            # skip empty lines
-            if not line:
-                continue
-            # skip comments
-            if line[0] == "c":
-                continue
-            if parser_state == ParserState.INIT:
-                if line[0] != "p":
-                    raise ValueError(
-                        'Error on line {}: Unexpected character "{}" found while parsing in INIT state'.format(
-                            line_num, line[0]
-                        )
-                    )
-                prob_info = line.split()
-                assert len(prob_info) == 4
-                assert prob_info[0] == "p"
-                assert prob_info[1] == "cnf", "Non-CNF formats unsupported"
-                try:
-                    num_literals = int(prob_info[2])
-                except ValueError:
-                    print(
-                        'Error on line {}: Invalid (non-integer) number of literals: "{}"'.format(
-                            line_num, prob_info[2]
-                        )
-                    )
-                try:
-                    num_clauses = int(prob_info[3])
-                except ValueError:
-                    print(
-                        'Error on line {}: Invalid (non-integer) number of clauses: "{}"'.format(
-                            line_num, prob_info[3]
-                        )
-                    )
-                parser_state = ParserState.PROB
-            elif parser_state == ParserState.PROB:
-                literal_strs = line.split()
-                literals = set()
-                final_line = False  # track whether 0 encountered
-                for index, literal_str in enumerate(literal_strs):
-                    if literal_str == "0":
-                        assert (
-                            index == len(literal_strs) - 1
-                        ), "Error on line {}: Zero terminator encountered in index {}, not as final integer".format(
-                            line_num, index
-                        )
-                        final_line = True
-                    else:
-                        try:
-                            literal = int(literal_str)
-                        except ValueError:
-                            print(
-                                'Error on line {}: Invalid (non-integer) literal value encountered: "{}"'.format(
-                                    line_num, literal_str
-                                )
-                            )
-                        literals.add(literal)
-                current_literals |= literals
-                if final_line:
-                    clauses.append(Clause(current_literals))
-                    current_literals.clear()
-            else:
-                raise ValueError(
-                    'Error on line {}: Parser is in unknown state "{}"'.format(
-                        line_num, parser_state
-                    )
-                )
-    if current_literals:
+    try:
+        num_literals = int(prob_info[2])
+    except ValueError:
+        print(
+            'Error on line {}: Invalid (non-integer) number of literals: "{}"'.format(
+                line_num, prob_info[2]
+            )
+        )
+    try:
+        num_clauses = int(prob_info[3])
+    except ValueError:
+        print(
+            'Error on line {}: Invalid (non-integer) number of clauses: "{}"'.format(
+                line_num, prob_info[3]
+            )
+        )
+
+    # Convert every token after the header in one pass; clauses are the runs
+    # of literals between 0 terminators and may span several lines
+    try:
+        literals = array("i", map(int, data[header.end() :].split()))
+    except ValueError as e:
+        raise ValueError(
+            "Error after line {}: Invalid (non-integer) literal value encountered: {}".format(
+                line_num, e
+            )
+        ) from e
+    unterminated = 0
+    while unterminated < len(literals) and literals[-1 - unterminated] != 0:
+        unterminated += 1
+    if unterminated:
         raise ValueError(
             "Error at end of file: Last clause not terminated with 0, {} literals discarded".format(
-                len(current_literals)
+                unterminated
             )
         )
-    return CNF(clauses, num_literals=num_literals, num_clauses=num_clauses)
+    # A missing 0 inside the file silently merges two clauses into one, which
+    # shows up as one clause fewer than the header declares
+    num_read = literals.count(0)
+    if num_clauses >= 0 and num_read != num_clauses:
+        print(
+            "Warning on line {}: Header declares {} clauses but {} were read".format(
+                line_num, num_clauses, num_read
+            )
+        )
+    return literals, num_literals, num_clauses
+
+
+def parse_dimacs(filename) -> CNF:
+    literals, num_literals, num_clauses = read_dimacs(filename)
+    return CNF.from_literals(
+        literals, num_literals=num_literals, num_clauses=num_clauses
+    )
+
+
+def share_literals(literals: array) -> SharedMemory:
+    """
+    Copies a clause literal stream into a new shared memory block, so a worker
+    process can load the problem with solve_shared() instead of unpickling it.
+    The caller owns the block and must close() and unlink() it.
+    """
+    data = literals.tobytes()
+    shm = SharedMemory(create=True, size=max(len(data), 1))
+    shm.buf[: len(data)] = data
+    return shm
+
+
+def solve_shared(
+    shm_name: str,
+    length: int,
+    num_literals: int = -1,
+    num_clauses: int = -1,
+    verbose: bool = False,
+) -> bool:
+    """
+    Runs DPLL on the `length` clause literals published by share_literals()
+    in the shared memory block `shm_name`.
+    """
+    shm = SharedMemory(name=shm_name)
+    try:
+        literals = array("i")
+        literals.frombytes(shm.buf[: length * literals.itemsize])
+    finally:
+        shm.close()
+    problem = CNF.from_literals(
+        literals, num_literals=num_literals, num_clauses=num_clauses
+    )
+    return problem.dpll(verbose=verbose)
+
+
+class ParseDimacsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def read(self, text):
+        """Writes the text to a temporary DIMACS file and reads it back."""
+        filepath = os.path.join(self.tmpdir.name, "test.cnf")
+        with open(filepath, "w") as f:
+            f.write(text)
+        return read_dimacs(filepath)
+
+    def test_01_clause_spanning_lines(self):
+        """Test that a clause continues on the next line until its 0."""
+        literals, num_literals, num_clauses = self.read("p cnf 3 1\n1 -2\n3 0\n")
+        self.assertEqual(list(literals), [1, -2, 3, 0])
+        self.assertEqual((num_literals, num_clauses), (3, 1))
+
+    def test_02_clauses_sharing_a_line(self):
+        """Test that several clauses on one line are split at their 0s."""
+        literals, _, _ = self.read("p cnf 3 2\n1 -2 0 3 0\n")
+        self.assertEqual(list(literals), [1, -2, 0, 3, 0])
+
+    def test_03_comments_after_header(self):
+        """Test that comment lines are skipped anywhere in the file."""
+        literals, _, _ = self.read("c first\np cnf 2 1\nc middle\n1 2 0\nc last\n")
+        self.assertEqual(list(literals), [1, 2, 0])
+
+    def test_04_unterminated_clause(self):
+        """Test that a last clause without its 0 is an error."""
+        with self.assertRaisesRegex(ValueError, "not terminated with 0, 2 literals"):
+            self.read("p cnf 2 2\n1 0\n-1 2\n")
+
+    def test_05_non_integer_literal(self):
+        """Test that a token that is not an integer is an error."""
+        with self.assertRaisesRegex(ValueError, r"Invalid \(non-integer\) literal"):
+            self.read("p cnf 2 1\n1 x 0\n")
+
+    def test_06_clause_count_mismatch(self):
+        """Test that a missing 0 inside the file is reported as a clause count mismatch."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            literals, _, _ = self.read("p cnf 3 3\n1 2 0\n-1 3\n2 -3 0\n")
+        self.assertEqual(list(literals), [1, 2, 0, -1, 3, 2, -3, 0])
+        self.assertEqual(
+            output.getvalue(),
+            "Warning on line 0: Header declares 3 clauses but 2 were read\n",
+        )
 
 
 if __name__ == "__main__":
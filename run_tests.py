@@ -1,12 +1,17 @@
+import hashlib
 import os
+import sqlite3
 import sys
+import tempfile
 import time
+import unittest
+from contextlib import closing
 from enum import Enum
+from typing import Optional
+from unittest import mock
 
-import pandas as pd
-from tqdm import tqdm
-
-from parse_dimacs import parse_dimacs
+from dpll_sat import CNF
+from parse_dimacs import read_dimacs, share_literals, solve_shared
 from timeout import timeout_wrapper, TimeoutError
 
 
@@ -16,18 +21,61 @@ class TestResult(Enum):
     TIMEOUT = 2
 
 
-def run_test(filepath, verbose: bool = False, timeout: int = 5):
+# Bump this whenever a solver change can affect results: cached results are
+# only reused for the same file contents and solver version
+SOLVER_VERSION = 1
+CACHE_PATH = os.path.join("results", "cache.sqlite3")
+
+
+def open_cache(path: str = CACHE_PATH) -> sqlite3.Connection:
+    """
+    Opens (creating it if needed) the database of SAT/UNSAT results, keyed by
+    the SHA-256 of the DIMACS file and the solver version.
+    """
+    cache = sqlite3.connect(path)
+    cache.execute(
+        "CREATE TABLE IF NOT EXISTS results ("
+        "sha256 TEXT, solver_version INTEGER, result TEXT, runtime REAL, "
+        "PRIMARY KEY (sha256, solver_version))"
+    )
+    return cache
+
+
+def run_test(
+    filepath,
+    verbose: bool = False,
+    timeout: int = 5,
+    cache: Optional[sqlite3.Connection] = None,
+):
     _, filename = os.path.split(filepath)
+    if cache is not None:
+        with open(filepath, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        row = cache.execute(
+            "SELECT result, runtime FROM results "
+            "WHERE sha256 = ? AND solver_version = ?",
+            (digest, SOLVER_VERSION),
+        ).fetchone()
+        if row is not None:
+            if verbose:
+                print("Cached result for {}: {}".format(filename, row[0]))
+            return TestResult[row[0]], row[1]
     if verbose:
         print("Parsing file:", filename)
-    problem = parse_dimacs(filepath)
+    literals, num_literals, num_clauses = read_dimacs(filepath)
     if verbose:
-        print(problem)
+        print(CNF.from_literals(literals, num_literals, num_clauses))
         print("Solving problem...")
+    # The worker loads the clauses from shared memory rather than having the
+    # whole problem pickled over to it
+    shm = share_literals(literals)
     start_time = time.time()
     try:
         result = timeout_wrapper(
-            problem.dpll, kwargs={"verbose": verbose}, timeout_seconds=timeout
+            solve_shared,
+            args=(shm.name, len(literals), num_literals, num_clauses),
+            kwargs={"verbose": verbose},
+            timeout_seconds=timeout,
         )
         runtime = time.time() - start_time
         if verbose:
@@ -36,29 +84,85 @@ def run_test(filepath, verbose: bool = False, timeout: int = 5):
                     runtime, "SAT" if result else "UNSAT"
                 )
             )
-        if result:
-            return TestResult.SAT, runtime
-        else:
-            return TestResult.UNSAT, runtime
+        test_result = TestResult.SAT if result else TestResult.UNSAT
     except TimeoutError:
         if verbose:
             print("Problem solve process timed out ({}s)".format(timeout))
+        # Timeouts are not cached, a later run may have a longer timeout
         return TestResult.TIMEOUT, timeout
+    finally:
+        shm.close()
+        shm.unlink()
+    if cache is not None:
+        with cache:
+            cache.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (digest, SOLVER_VERSION, test_result.name, runtime),
+            )
+    return test_result, runtime
+
+
+class CacheTests(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.filepath = os.path.join(tmpdir.name, "test.cnf")
+        with open(self.filepath, "w") as f:
+            f.write("p cnf 2 2\n1 2 0\n-1 0\n")
+        self.cache = open_cache(":memory:")
+        self.addCleanup(self.cache.close)
+        # Count solver calls instead of starting a worker process
+        patcher = mock.patch(__name__ + ".timeout_wrapper", return_value=True)
+        self.solver = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_01_hit_skips_solving(self):
+        """Test that a cached result is returned without solving again."""
+        first = run_test(self.filepath, cache=self.cache)
+        second = run_test(self.filepath, cache=self.cache)
+        self.assertEqual(first[0], TestResult.SAT)
+        self.assertEqual(second, first)
+        self.assertEqual(self.solver.call_count, 1)
+
+    def test_02_timeout_not_cached(self):
+        """Test that timeouts are solved again on the next run."""
+        self.solver.side_effect = TimeoutError
+        test_result, _ = run_test(self.filepath, cache=self.cache)
+        self.assertEqual(test_result, TestResult.TIMEOUT)
+        self.solver.side_effect = None
+        test_result, _ = run_test(self.filepath, cache=self.cache)
+        self.assertEqual(test_result, TestResult.SAT)
+        self.assertEqual(self.solver.call_count, 2)
+
+    def test_03_solver_version_bump_misses(self):
+        """Test that results cached by an older solver version are not reused."""
+        run_test(self.filepath, cache=self.cache)
+        with mock.patch(__name__ + ".SOLVER_VERSION", SOLVER_VERSION + 1):
+            run_test(self.filepath, cache=self.cache)
+        self.assertEqual(self.solver.call_count, 2)
 
 
 if __name__ == "__main__":
+    import pandas as pd
+    from tqdm import tqdm
+
     filenames = os.listdir("aim")
     timeout = 10  # seconds
     test_results = []
     runtimes = []
     num_problems = len(filenames)
-    with tqdm(total=num_problems, desc="Total Progress") as pbar:
+    with closing(open_cache()) as cache, tqdm(
+        total=num_problems, desc="Total Progress"
+    ) as pbar:
         for i, filename in enumerate(filenames):
             desc = f"\rProcessing item {i+1} of {len(filenames)}... "
             pbar.set_description(desc)
             pbar.update(1)
             filepath = os.path.join("aim", filename)
-            test_result, runtime = run_test(filepath, verbose=False, timeout=timeout)
+            test_result, runtime = run_test(
+                filepath, verbose=False, timeout=timeout, cache=cache
+            )
             test_results.append(test_result)
             runtimes.append(runtime)
     df_results = pd.DataFrame(
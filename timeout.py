@@ -1,3 +1,4 @@
+import atexit
 import multiprocessing
 import traceback
 import time
@@ -11,35 +12,74 @@ class FunctionException(Exception):
     """Wrapper exception to propagate exceptions from subprocess."""
 
 
-def _worker(func, args, kwargs, queue):
-    try:
-        result = func(*args, **kwargs)
-        queue.put((True, result))
-    except Exception as e:
-        tb = traceback.format_exc()
-        queue.put((False, (e, tb)))
+# Single worker process reused across timeout_wrapper calls, so the cost of
+# spawning an interpreter is only paid again after a timeout kills it. Calls
+# and results go over a plain Pipe: unlike a Pool or a Queue it needs no
+# helper threads or locks for one request at a time.
+_process = None
+_conn = None
+
+
+def _worker(conn):
+    while True:
+        try:
+            func, args, kwargs = conn.recv()
+        except EOFError:
+            return
+        try:
+            result = func(*args, **kwargs)
+            conn.send((True, result))
+        except Exception as e:
+            tb = traceback.format_exc()
+            conn.send((False, (e, tb)))
+
+
+def close_worker():
+    """Terminates the worker process, if one is running."""
+    global _process, _conn
+    if _process is not None:
+        _conn.close()
+        _process.terminate()
+        _process.join()
+        _process = _conn = None
+
+
+atexit.register(close_worker)
 
 
 def timeout_wrapper(func, args=(), kwargs=None, timeout_seconds=30):
     """
     Executes a function in a separate process with a robust timeout mechanism.
-    This avoids deadlocks on Windows caused by ProcessPoolExecutor.
+    The worker process is kept alive between calls and is only replaced when a
+    call times out. This avoids deadlocks on Windows caused by ProcessPoolExecutor.
     """
+    global _process, _conn
     if kwargs is None:
         kwargs = {}
 
-    ctx = multiprocessing.get_context("spawn")  # safest for Windows
-    queue = ctx.Queue()
-    process = ctx.Process(target=_worker, args=(func, args, kwargs, queue))
-    process.start()
-    process.join(timeout_seconds)
-
-    if process.is_alive():
-        process.terminate()
-        process.join()
-        raise TimeoutError(f"Function call exceeded {timeout_seconds} seconds")
+    if _process is None:
+        ctx = multiprocessing.get_context("spawn")  # safest for Windows
+        _conn, child_conn = ctx.Pipe()
+        _process = ctx.Process(target=_worker, args=(child_conn,), daemon=True)
+        _process.start()
+        child_conn.close()
+    try:
+        _conn.send((func, args, kwargs))
+        if not _conn.poll(timeout_seconds):
+            raise TimeoutError(f"Function call exceeded {timeout_seconds} seconds")
+        success, payload = _conn.recv()
+    except (EOFError, OSError) as e:
+        # The worker died, before this call (send fails with a broken pipe)
+        # or during it (recv finds the pipe closed)
+        close_worker()
+        raise FunctionException("Worker process exited unexpectedly") from e
+    except BaseException:
+        # A call that did not get its result (timed out or interrupted, e.g. by
+        # KeyboardInterrupt) leaves it pending in the worker: discard the worker
+        # so the next call cannot receive it
+        close_worker()
+        raise
 
-    success, payload = queue.get()
     if success:
         return payload
     else: